@@ -14,6 +14,12 @@ START_DATE = "2020-01-01"
 END_DATE = "2025-06-30"
 STORY_LIMIT = 20000
 
+# Optional transformer sentiment model (ONNX export of an SST-2 classifier).
+# Used instead of VADER when set and ONNX Runtime has a GPU provider;
+# requires `pip install onnxruntime-gpu` (or `onnxruntime` on Apple silicon).
+SENTIMENT_ONNX_MODEL = os.getenv("SENTIMENT_ONNX_MODEL")
+SENTIMENT_TOKENIZER = "distilbert-base-uncased-finetuned-sst-2-english"
+
 # Collection IDs
 INDIA_NATIONAL_COL = 34412118
 INDIA_STATE_LOCAL_COL = 38379954
@@ -27,6 +33,8 @@ DIRS = {
     "framing": os.path.join(OUTPUT_DIR, "framing"),
     "keywords": os.path.join(OUTPUT_DIR, "keywords"),
 }
+# Embedding/cluster cache (kept between runs)
+CACHE_DIR = os.path.join(OUTPUT_DIR, ".cache")
 
 # Queries
 QUERIES = {
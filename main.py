@@ -6,138 +6,183 @@ os.environ["JOBLIB_MULTIPROCESSING"] = "0"
 import config
 from modules import data_loader, clustering, analysis, visualization
 import pandas as pd
+import orjson
+import gc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def clear_topic_outputs(topic_name):
+    """
+    Removes a topic's previous report, JSON export and plots.
+    Other topics' outputs and the cache are left untouched.
+    """
+    prefix = f"{topic_name}_"
+    for folder_path in [config.OUTPUT_DIR, *config.DIRS.values()]:
+        for entry in os.listdir(folder_path):
+            path = os.path.join(folder_path, entry)
+            if entry.startswith(prefix) and os.path.isfile(path):
+                os.remove(path)
+
+
+def load_and_cluster(topic_name):
+    """
+    Phase 1: loads a topic and groups its stories into events.
+    Runs in the main process so SBERT and the embedding cache are shared, and
+    so is the ONNX sentiment model when one is in use.
+    Returns None when the topic has no data.
+    """
+    # 1. Load Data
+    try:
+        df = data_loader.get_data(topic_name)
+        if df.empty:
+            print(f"No stories found for {topic_name}. Skipping.")
+            return None
+    except Exception as e:
+        print(f"Error loading data for {topic_name}: {e}")
+        return None
+
+    # 2. Clustering
+    df = clustering.group_stories(df)
+    num_clusters = df["cluster_id"].nunique()
+    print(
+        f"DEBUG: Topic '{topic_name}' - Formed {num_clusters} clusters from {len(df)} stories."
+    )
+
+    # GPU sentiment stays here with SBERT: one ONNX session for every topic
+    # instead of one per worker competing for the same device
+    if analysis.has_onnx_model():
+        df = analysis.analyze_sentiment(df)
+    return df
+
+
+def analyze_and_report(df, topic_name):
+    """
+    Phase 2: sentiment (unless phase 1 scored it), keywords, network, plots,
+    report and JSON export.
+    Independent per topic, so it runs in a worker process.
+    """
+    # 3. Analysis (already done in phase 1 when the ONNX model is in use)
+    if "sentiment_label" not in df.columns:
+        df = analysis.analyze_sentiment(df, use_onnx=False)
+
+    # Keywords
+    print("Extracting keywords...")
+    keywords = analysis.extract_keywords(df)
+
+    # Network
+    G = analysis.build_network(df)
+
+    # 4. Visualization
+    print("Generating visualizations...")
+    visualization.render_all(df, topic_name, G)
+
+    # 5. Generate Text Report
+    report_path = os.path.join(config.OUTPUT_DIR, f"{topic_name}_report.txt")
+    print(f"Generating report: {report_path}")
+    lines = [
+        f"Analysis Report for {topic_name}\n",
+        "=" * 50 + "\n\n",
+        f"Total Stories: {len(df)}\n",
+        f"Total Clusters: {len(set(df['cluster_id']))}\n\n",
+        "Top Keywords:\n",
+    ]
+    for k, v in keywords.items():
+        lines.append(f"  - {k}: {v:.2f}\n")
+    lines.append("\n")
+
+    lines.append("Top Event Clusters:\n")
+    top_clusters = df["cluster_id"].value_counts(sort=False).nlargest(10)
+    # First title of every cluster in one pass, instead of a mask per cluster
+    first_titles = df.drop_duplicates("cluster_id").set_index("cluster_id")["title"]
+    for cid, count in top_clusters.items():
+        lines.append(f"  - Cluster {cid} ({count} stories): {first_titles[cid]}\n")
+
+    with open(report_path, "w", buffering=1 << 16) as f:
+        f.writelines(lines)
+
+    # 6. Generate JSON Export
+    json_path = os.path.join(config.OUTPUT_DIR, f"{topic_name}_clusters.json")
+    print(f"Generating JSON export: {json_path}")
+
+    # Project the story fields once, then slice the records per cluster
+    columns = ["cluster_id", "title", "url", "publish_date", "media_name"]
+    stories_df = df[columns + ["sentiment_label"]].rename(
+        columns={"sentiment_label": "sentiment"}
+    )
+    stories_df["publish_date"] = stories_df["publish_date"].dt.strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    records = stories_df.drop(columns="cluster_id").to_dict(orient="records")
+
+    # Group by cluster_id
+    clusters_data = []
+    for cid, rows in sorted(stories_df.groupby("cluster_id").indices.items()):
+        stories = [records[i] for i in rows]
+        clusters_data.append(
+            {"cluster_id": int(cid), "size": len(stories), "stories": stories}
+        )
 
+    # Sort by size descending
+    clusters_data.sort(key=lambda x: x["size"], reverse=True)
 
-import shutil
+    payload = {
+        "topic": topic_name,
+        "total_stories": len(df),
+        "total_clusters": len(clusters_data),
+        "clusters": clusters_data,
+    }
+    with open(json_path, "wb", buffering=1 << 20) as f:
+        f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
 
 
 def run_analysis_pipeline():
     print("Starting Media Bias Analysis Pipeline...")
     print(f"Output Directory: {config.OUTPUT_DIR}")
 
-    # Clear previous outputs
-    if os.path.exists(config.OUTPUT_DIR):
-        print("Clearing previous outputs...")
-        shutil.rmtree(config.OUTPUT_DIR)
-
     # Ensure output directories exist
     os.makedirs(config.OUTPUT_DIR, exist_ok=True)
     for folder_path in config.DIRS.values():
         os.makedirs(folder_path, exist_ok=True)
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+
+    # Clustering runs serially here; each clustered topic is handed to the
+    # pool while the next one is being clustered.
+    topics = list(config.QUERIES.keys())
+    max_workers = min(len(topics), os.cpu_count() or 1)
+    # spawn: workers start clean instead of forking torch/BLAS thread state
+    mp_context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as pool:
+        futures = {}
 
-    # Iterate through all topics defined in config
-    for topic_name in config.QUERIES.keys():
-        print(f"\n{'='*50}")
-        print(f"Processing Topic: {topic_name}")
-        print(f"{'='*50}")
-
-        # 1. Load Data
-        try:
-            df = data_loader.get_data(topic_name)
-            if df.empty:
-                print(f"No stories found for {topic_name}. Skipping.")
+        # Iterate through all topics defined in config
+        for topic_name in topics:
+            print(f"\n{'='*50}")
+            print(f"Processing Topic: {topic_name}")
+            print(f"{'='*50}")
+
+            # Clear previous outputs for this topic
+            clear_topic_outputs(topic_name)
+
+            df = load_and_cluster(topic_name)
+            if df is None:
                 continue
-        except Exception as e:
-            print(f"Error loading data for {topic_name}: {e}")
-            continue
-
-        # 2. Clustering
-        df = clustering.group_stories(df)
-        num_clusters = df["cluster_id"].nunique()
-        print(
-            f"DEBUG: Topic '{topic_name}' - Formed {num_clusters} clusters from {len(df)} stories."
-        )
 
-        # 3. Analysis
-        df = analysis.analyze_sentiment(df)
+            futures[pool.submit(analyze_and_report, df, topic_name)] = topic_name
 
-        # Keywords
-        print("Extracting keywords...")
-        keywords = analysis.extract_keywords(df)
-
-        # Network
-        G = analysis.build_network(df)
-
-        # 4. Visualization
-        print("Generating visualizations...")
-        visualization.plot_coverage_over_time(df, topic_name)
-        visualization.plot_sentiment_distribution(df, topic_name)
-        visualization.plot_event_framing(df, topic_name)
-        visualization.plot_source_network(G, topic_name)
-        visualization.plot_top_keywords(df, topic_name)
-
-        # 5. Generate Text Report
-        report_path = os.path.join(config.OUTPUT_DIR, f"{topic_name}_report.txt")
-        print(f"Generating report: {report_path}")
-        with open(report_path, "w") as f:
-            f.write(f"Analysis Report for {topic_name}\n")
-            f.write("=" * 50 + "\n\n")
-            f.write(f"Total Stories: {len(df)}\n")
-            f.write(f"Total Clusters: {len(set(df['cluster_id']))}\n\n")
-
-            f.write("Top Keywords:\n")
-            for k, v in keywords.items():
-                f.write(f"  - {k}: {v:.2f}\n")
-            f.write("\n")
-
-            f.write("Top Event Clusters:\n")
-            top_clusters = df["cluster_id"].value_counts().head(10)
-            for cid, count in top_clusters.items():
-                cluster_df = df[df["cluster_id"] == cid]
-                sample_title = cluster_df["title"].iloc[0]
-                f.write(f"  - Cluster {cid} ({count} stories): {sample_title}\n")
-
-        # 6. Generate JSON Export
-        json_path = os.path.join(config.OUTPUT_DIR, f"{topic_name}_clusters.json")
-        print(f"Generating JSON export: {json_path}")
-
-        # Group by cluster_id
-        clusters_data = []
-        for cid, cluster_df in df.groupby("cluster_id"):
-            stories = []
-            for _, row in cluster_df.iterrows():
-                stories.append(
-                    {
-                        "title": row.get("title", ""),
-                        "url": row.get("url", ""),
-                        "publish_date": str(row.get("publish_date", "")),
-                        "media_name": row.get("media_name", ""),
-                        "sentiment": row.get("sentiment_label", ""),
-                    }
-                )
-
-            clusters_data.append(
-                {"cluster_id": int(cid), "size": len(stories), "stories": stories}
-            )
-
-        # Sort by size descending
-        clusters_data.sort(key=lambda x: x["size"], reverse=True)
-
-        import json
-
-        with open(json_path, "w") as f:
-            json.dump(
-                {
-                    "topic": topic_name,
-                    "total_stories": len(df),
-                    "total_clusters": len(clusters_data),
-                    "clusters": clusters_data,
-                },
-                f,
-                indent=2,
-            )
-
-        # Clean up memory
-        print(f"Cleaning up memory for {topic_name}...")
-        del df
-        if "G" in locals():
-            del G
-        if "keywords" in locals():
-            del keywords
-        import gc
+            # Drop our reference (the worker has its own copy); refcounting
+            # frees the frame, so no per-topic cycle collection is needed
+            del df
 
+        # One cycle collection per run, once every topic has been handed off
+        print("Cleaning up memory...")
         gc.collect()
 
+        for future in as_completed(futures):
+            future.result()
+            print(f"Finished analysis for {futures[future]}.")
+
     print("\nPipeline Completed Successfully.")
 
 
@@ -1,38 +1,130 @@
+import numpy as np
 import pandas as pd
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from textblob import TextBlob
+from textblob.en import sentiment as pattern_sentiment
 from sklearn.feature_extraction.text import TfidfVectorizer
 import networkx as nx
+from scipy.sparse import csr_matrix
+import config
 
+# Initialize VADER (Global to avoid reloading its lexicon per topic)
+analyzer = SentimentIntensityAnalyzer()
 
-def analyze_sentiment(df):
+# Category order of sentiment_label
+SENTIMENT_LABELS = ["Negative", "Neutral", "Positive"]
+
+ONNX_BATCH_SIZE = 128
+ONNX_GPU_PROVIDERS = ["CUDAExecutionProvider", "CoreMLExecutionProvider"]
+# (session, tokenizer) once loaded; False once loading failed; None if untried
+_onnx_model = None
+
+
+def _load_onnx_model():
     """
-    Applies VADER sentiment and TextBlob subjectivity analysis.
+    Returns (session, tokenizer) for config.SENTIMENT_ONNX_MODEL, or None when no
+    model is configured or ONNX Runtime has no GPU/MPS provider.
+    The session is created once and reused across topics; a failed load is
+    remembered too, so it is not retried (or reported) for every topic.
     """
-    if df.empty:
-        return df
+    global _onnx_model
+    if _onnx_model is not None:
+        return _onnx_model or None
+    if not config.SENTIMENT_ONNX_MODEL:
+        _onnx_model = False
+        return None
 
-    print("Running Sentiment & Subjectivity Analysis...")
-    analyzer = SentimentIntensityAnalyzer()
+    try:
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+    except ImportError as e:
+        print(f"ONNX sentiment model unavailable ({e}). Falling back to VADER.")
+        _onnx_model = False
+        return None
+
+    providers = [p for p in ONNX_GPU_PROVIDERS if p in ort.get_available_providers()]
+    if not providers:
+        _onnx_model = False
+        return None
+
+    print(f"Loading ONNX sentiment model on {providers[0]}...")
+    session = ort.InferenceSession(
+        config.SENTIMENT_ONNX_MODEL, providers=providers + ["CPUExecutionProvider"]
+    )
+    tokenizer = AutoTokenizer.from_pretrained(config.SENTIMENT_TOKENIZER)
+    _onnx_model = (session, tokenizer)
+    return _onnx_model
+
+
+def has_onnx_model():
+    """True when sentiment is scored by the ONNX model (loading it if needed)."""
+    return _load_onnx_model() is not None
+
+
+def _onnx_sentiment_scores(titles, session, tokenizer):
+    """
+    Batch-infers signed sentiment scores (P(positive) - P(negative)) in [-1, 1].
+    """
+    input_names = {i.name for i in session.get_inputs()}
+    scores = np.empty(len(titles), dtype=np.float32)
+
+    for start in range(0, len(titles), ONNX_BATCH_SIZE):
+        batch = titles[start : start + ONNX_BATCH_SIZE]
+        encoded = tokenizer(batch, padding=True, truncation=True, return_tensors="np")
+        feed = {k: v.astype(np.int64) for k, v in encoded.items() if k in input_names}
+        logits = session.run(None, feed)[0]
 
-    def get_vader_scores(text):
-        return analyzer.polarity_scores(str(text))["compound"]
+        # Softmax over [negative, positive]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        scores[start : start + len(batch)] = probs[:, 1] - probs[:, 0]
 
-    def get_subjectivity(text):
-        return TextBlob(str(text)).sentiment.subjectivity
+    return scores
 
-    df["sentiment_score"] = df["title"].apply(get_vader_scores)
-    df["subjectivity_score"] = df["title"].apply(get_subjectivity)
 
-    # Categorize
-    def get_label(score):
-        if score >= 0.05:
-            return "Positive"
-        if score <= -0.05:
-            return "Negative"
-        return "Neutral"
+def analyze_sentiment(df, use_onnx=True):
+    """
+    Applies VADER sentiment and TextBlob subjectivity analysis.
+    VADER is swapped for the ONNX model in config.SENTIMENT_ONNX_MODEL when one is
+    configured and a GPU/MPS provider is available, unless use_onnx is False.
+    """
+    if df.empty:
+        return df
 
-    df["sentiment_label"] = df["sentiment_score"].apply(get_label)
+    print("Running Sentiment & Subjectivity Analysis...")
+    titles = [str(t) for t in df["title"].tolist()]
+
+    onnx_model = _load_onnx_model() if use_onnx else None
+    if onnx_model is not None:
+        scores = _onnx_sentiment_scores(titles, *onnx_model)
+    else:
+        # Hoist the scorer out of the loop
+        polarity_scores = analyzer.polarity_scores
+        scores = np.fromiter(
+            (polarity_scores(t)["compound"] for t in titles),
+            dtype=np.float32,
+            count=len(titles),
+        )
+
+    # TextBlob's subjectivity is read straight from its pattern lexicon scorer,
+    # skipping a TextBlob object per title. Kept float64: most scores land
+    # exactly on the histogram's 0.05 bin edges, where float32 rounding
+    # would move them into the neighbouring bin.
+    subjectivity = np.fromiter(
+        (pattern_sentiment(t)[1] for t in titles),
+        dtype=np.float64,
+        count=len(titles),
+    )
+
+    df["sentiment_score"] = scores
+    df["subjectivity_score"] = subjectivity
+
+    # Categorize as int8 codes into SENTIMENT_LABELS, so masks, value_counts
+    # and groupbys downstream never hash the label strings
+    codes = np.select([scores >= 0.05, scores <= -0.05], [2, 0], default=1)
+    df["sentiment_label"] = pd.Categorical.from_codes(
+        codes.astype(np.int8), categories=SENTIMENT_LABELS
+    )
 
     return df
 
@@ -54,18 +146,48 @@ def extract_keywords(df, top_n=10):
         tfidf_matrix = vectorizer.fit_transform(df["title"].fillna(""))
 
         feature_names = vectorizer.get_feature_names_out()
-        # Sum tfidf scores for each term across all documents
-        dense = tfidf_matrix.todense()
-        denselist = dense.tolist()
-        df_tfidf = pd.DataFrame(denselist, columns=feature_names)
+        # Sum tfidf scores for each term across all documents (stays sparse)
+        sums = np.asarray(tfidf_matrix.sum(axis=0)).ravel()
+        order = np.argsort(-sums, kind="stable")[:top_n]
 
-        keywords = df_tfidf.sum().sort_values(ascending=False).head(top_n).to_dict()
+        keywords = dict(zip(feature_names[order].tolist(), sums[order].tolist()))
         return keywords
     except ValueError:
         # Handle empty vocabulary or other issues
         return {}
 
 
+def extract_sentiment_keywords(df, top_n=10, labels=("Positive", "Negative")):
+    """
+    Extracts top TF-IDF keywords per sentiment label from a single fit over all
+    titles, summing each label's rows.
+    Returns a dictionary of {label: {keyword: score}}.
+    """
+    keywords = {label: {} for label in labels}
+    if df.empty:
+        return keywords
+
+    try:
+        vectorizer = TfidfVectorizer(stop_words="english")
+        tfidf_matrix = vectorizer.fit_transform(df["title"].fillna(""))
+    except ValueError:
+        # Handle empty vocabulary
+        return keywords
+
+    feature_names = vectorizer.get_feature_names_out()
+    for label in labels:
+        mask = (df["sentiment_label"] == label).to_numpy()
+        sums = np.asarray(tfidf_matrix[mask].sum(axis=0)).ravel()
+
+        # Stable sort over the (alphabetical) vocabulary: ties, including at
+        # the top_n cut-off, go to the alphabetically first term
+        top = np.argsort(-sums, kind="stable")[:top_n]
+        top = top[sums[top] > 0]
+
+        keywords[label] = dict(zip(feature_names[top].tolist(), sums[top].tolist()))
+    return keywords
+
+
 def build_network(df):
     """
     Builds a source similarity network based on shared event clusters.
@@ -75,7 +197,7 @@ def build_network(df):
 
     print("Building source network...")
     # Filter for top sources to keep graph manageable
-    top_sources = df["media_name"].value_counts().head(20).index.tolist()
+    top_sources = df["media_name"].value_counts(sort=False).nlargest(20).index.tolist()
     df_top = df[df["media_name"].isin(top_sources)].copy()
 
     # Clean source names (remove .com, .in, www., etc.)
@@ -87,23 +209,35 @@ def build_network(df):
 
     df_top["clean_source"] = df_top["media_name"].apply(clean_source_name)
 
-    # Re-calculate top sources based on clean names
-    source_clusters = df_top.groupby("clean_source")["cluster_id"].apply(set).to_dict()
-    top_clean_sources = list(source_clusters.keys())
+    # Binary (source x cluster) incidence matrix on the clean names
+    sources, source_idx = np.unique(
+        df_top["clean_source"].astype(str).to_numpy(), return_inverse=True
+    )
+    clusters, cluster_idx = np.unique(
+        df_top["cluster_id"].to_numpy(), return_inverse=True
+    )
+    incidence = csr_matrix(
+        (np.ones(len(df_top), dtype=np.int32), (source_idx, cluster_idx)),
+        shape=(len(sources), len(clusters)),
+    )
+    incidence.sum_duplicates()
+    incidence.data[:] = 1
+
+    # Pairwise Jaccard: |A & B| / (|A| + |B| - |A & B|)
+    intersection = (incidence @ incidence.T).toarray()
+    sizes = np.asarray(incidence.sum(axis=1)).ravel()
+    union = sizes[:, None] + sizes[None, :] - intersection
+    jaccard = np.divide(intersection, union, out=np.zeros(union.shape), where=union > 0)
 
     G = nx.Graph()
-    for s in top_clean_sources:
-        G.add_node(s)
-
-    sources = top_clean_sources
-    for i in range(len(sources)):
-        for j in range(i + 1, len(sources)):
-            s1, s2 = sources[i], sources[j]
-            set1, set2 = source_clusters[s1], source_clusters[s2]
-
-            union_len = len(set1.union(set2))
-            if union_len > 0:
-                jaccard = len(set1.intersection(set2)) / union_len
-                if jaccard > 0.075:  # Threshold for edge
-                    G.add_edge(s1, s2, weight=jaccard)
+    G.add_nodes_from(sources.tolist())
+
+    rows, cols = np.nonzero(np.triu(jaccard > 0.075, k=1))  # Threshold for edge
+    G.add_weighted_edges_from(
+        zip(
+            sources[rows].tolist(),
+            sources[cols].tolist(),
+            jaccard[rows, cols].tolist(),
+        )
+    )
     return G
@@ -1,106 +1,184 @@
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.cluster import AgglomerativeClustering
-from sklearn.metrics.pairwise import cosine_distances, euclidean_distances
-import gc
-
-# Initialize SBERT (Global to avoid reloading)
-print("Loading SBERT model (this may take a moment)...")
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-
-def group_stories(df):
+import hashlib
+import os
+from sklearn.neighbors import NearestNeighbors
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+import config
+
+# SBERT is loaded on first use (Global to avoid reloading). torch and
+# sentence-transformers are imported there too, so worker processes that
+# only import this module never pay for them.
+MODEL_NAME = "all-MiniLM-L6-v2"
+model = None
+device = None
+
+
+def get_device():
+    """Returns the fastest available device for SBERT: cuda, mps or cpu."""
+    global device
+    if device is None:
+        import torch
+
+        if torch.cuda.is_available():
+            device = "cuda"
+        elif torch.backends.mps.is_available():
+            device = "mps"
+        else:
+            device = "cpu"
+    return device
+
+
+def model_signature():
     """
-    Groups stories into events using Event Threading with Time Decay.
-    Reference: Nallapati et al. (2004)
-    Non-Blocking Optimization: Uses float32 and in-place operations to minimize RAM usage.
+    Identifies what produced the embeddings: model, device and precision.
+    Part of every cache key, so caches filled on another machine are not reused.
     """
-    if df.empty:
-        return df
+    # fp16 forward pass runs on tensor cores (CUDA only)
+    precision = "fp16" if get_device() == "cuda" else "fp32"
+    return f"{MODEL_NAME}|{get_device()}|{precision}"
 
-    print(f"Clustering {len(df)} stories using Time Decay...")
 
-    # 1. Embeddings
-    titles = df["title"].fillna("").tolist()
-    # Ensure embeddings are float32
-    print("Generating embeddings...")
-    embeddings = model.encode(titles, show_progress_bar=True)
-    embeddings = embeddings.astype(np.float32)
+def get_model():
+    """Returns the shared SBERT model, loading it on the first call."""
+    global model
+    if model is None:
+        from sentence_transformers import SentenceTransformer
 
-    # 2. Time Processing
-    df["publish_date"] = pd.to_datetime(df["publish_date"])
-    # Convert to days for distance calculation
-    dates = (df["publish_date"] - df["publish_date"].min()).dt.days.values.reshape(
-        -1, 1
-    )
-    dates = dates.astype(np.float32)
+        print(f"Loading SBERT model on {get_device()} (this may take a moment)...")
+        model = SentenceTransformer(MODEL_NAME, device=get_device())
+        if get_device() == "cuda":
+            model.half()
+    return model
 
-    # 3. Compute Distance/Similarity Matrices (In-Place Optimization)
 
-    # A. Content Similarity
-    # Calculate cosine distance (float32)
-    # Note: sklearn returns float64 by default, so we cast immediately.
-    print("Computing content distance...")
-    # We use a single large matrix 'sim_matrix' to save memory.
-    # Initially effectively content_dist
-    sim_matrix = cosine_distances(embeddings).astype(np.float32)
+# Clustering Parameters
+ALPHA = 0.15  # Time decay rate (per day)
+DISTANCE_THRESHOLD = 0.5  # Max combined distance for two stories to be linked
+N_NEIGHBORS = 50  # Candidate neighbours per story in the k-NN graph
+BATCH_SIZE = 256  # Titles per SBERT forward pass
 
-    # Free embeddings memory
-    del embeddings
-    gc.collect()
 
-    # Convert distance to similarity: Sim = 1 - Dist
-    # Operation: sim_matrix = 1 - sim_matrix
-    print("Converting to content similarity...")
-    sim_matrix *= -1
-    sim_matrix += 1
+def encode_titles(titles):
+    """
+    Returns L2-normalised float32 SBERT embeddings for a list of titles.
+    Embeddings are cached in config.CACHE_DIR keyed by a hash of the titles and
+    model_signature(), so re-runs on unchanged data skip the transformer
+    forward pass.
+    """
+    key = hashlib.sha1("\n".join([model_signature()] + titles).encode()).hexdigest()
+    cache_path = os.path.join(config.CACHE_DIR, f"{key}_embeddings.npy")
 
-    # Clip to [0, 1] in-place
-    np.clip(sim_matrix, 0, 1, out=sim_matrix)
+    if os.path.exists(cache_path):
+        print(f"Loading cached embeddings: {cache_path}")
+        return np.load(cache_path, mmap_mode="r")
 
-    # B. Time Decay
-    print("Computing time decay...")
-    time_dist = euclidean_distances(dates).astype(np.float32)
+    # Unit-length vectors, so cosine similarity reduces to a dot product
+    print("Generating embeddings...")
+    embeddings = get_model().encode(
+        titles,
+        batch_size=BATCH_SIZE,
+        show_progress_bar=True,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+    # fp16 models return float16 arrays; no copy when already float32
+    embeddings = embeddings.astype(np.float32, copy=False)
 
-    # Decay factor = exp(-alpha * time_dist)
-    ALPHA = 0.15
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    np.save(cache_path, embeddings)
+    return embeddings
 
-    # In-place: time_dist = -ALPHA * time_dist
-    time_dist *= -ALPHA
 
-    # In-place: time_dist = exp(time_dist) -> This becomes our decay_factor matrix
-    np.exp(time_dist, out=time_dist)
+def group_stories(df):
+    """
+    Groups stories into events using Event Threading with Time Decay.
+    Reference: Nallapati et al. (2004)
+    Sparse Optimization: Only the k nearest neighbours of each story are scored,
+    so memory grows as O(N*k) instead of O(N^2).
+    """
+    if df.empty:
+        return df
 
-    # C. Combined Similarity
-    # Sim_combined = Sim_content * Decay_factor
-    print("Applying time decay to similarity...")
-    sim_matrix *= time_dist
+    print(f"Clustering {len(df)} stories using Time Decay...")
 
-    # Free time matrix
-    del time_dist
-    gc.collect()
+    # 1. Time Processing
+    df["publish_date"] = pd.to_datetime(df["publish_date"])
+    # Convert to days for distance calculation (datetime64[D] truncates to
+    # whole days at cast time, without building a Timedelta series)
+    days = df["publish_date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    dates = (days - days.min()).astype(np.float32)
 
-    # 4. Convert back to Distance for Clustering
-    # Final_Dist = 1 - Combined_Sim
-    print("Converting to final distance matrix...")
-    sim_matrix *= -1
-    sim_matrix += 1
+    # 2. Cluster cache: same titles, dates and parameters give the same events
+    titles = df["title"].fillna("").tolist()
+    params = f"{model_signature()}|{ALPHA}|{DISTANCE_THRESHOLD}|{N_NEIGHBORS}"
+    hasher = hashlib.sha1(params.encode())
+    hasher.update("\n".join(titles).encode())
+    hasher.update(dates.tobytes())
+    labels_path = os.path.join(config.CACHE_DIR, f"{hasher.hexdigest()}_clusters.npy")
+
+    if os.path.exists(labels_path):
+        print(f"Loading cached clusters: {labels_path}")
+        df["cluster_id"] = np.load(labels_path)
+        print(f"Identified {len(set(df['cluster_id']))} clusters.")
+        return df
 
-    # Clip safe
-    np.clip(sim_matrix, 0, 1, out=sim_matrix)
+    embeddings = encode_titles(titles)
+
+    # 3. Content Similarity on the k-NN graph
+    # Brute-force cosine search is exact and chunked internally, so only the
+    # (N x k) neighbour distances are ever held in memory.
+    print("Finding nearest neighbours...")
+    k = min(N_NEIGHBORS, len(df))
+    nn = NearestNeighbors(n_neighbors=k, metric="cosine", algorithm="brute")
+    nn.fit(embeddings)
+    content_dist, neighbors = nn.kneighbors(embeddings)
+
+    # Free embeddings memory (collected once per topic by the pipeline)
+    del embeddings, nn
+
+    # Convert distance to similarity in-place: Sim = 1 - Dist, clipped to [0, 1]
+    # We reuse a single (N x k) buffer 'content_sim' to save memory.
+    content_sim = content_dist.astype(np.float32, copy=False)
+    del content_dist
+    np.subtract(1, content_sim, out=content_sim)
+    np.clip(content_sim, 0, 1, out=content_sim)
+
+    # Decay factor <= 1, so only pairs already above the threshold on content
+    # alone can survive it. Prune to those before doing any time arithmetic.
+    min_sim = 1 - DISTANCE_THRESHOLD
+    rows, cols = np.nonzero(content_sim > min_sim)
+    targets = neighbors[rows, cols]
+    combined_sim = content_sim[rows, cols]
+    del content_sim, cols
+
+    # 4. Time Decay (candidate edges only)
+    # Sim_combined = Sim_content * exp(-alpha * time_dist), built in-place
+    print(f"Applying time decay to {len(rows)} candidate edges...")
+    decay = dates[rows] - dates[targets]
+    np.abs(decay, out=decay)
+    decay *= -ALPHA
+    np.exp(decay, out=decay)
+    combined_sim *= decay
+    del decay
 
     # 5. Clustering
-    print("Running Agglomerative Clustering...")
-    clustering_model = AgglomerativeClustering(
-        n_clusters=None, distance_threshold=0.5, metric="precomputed", linkage="average"
+    # Keep edges whose combined distance (1 - Sim) is under the threshold and
+    # take each connected component of the resulting graph as one event.
+    print("Linking stories into events...")
+    linked = combined_sim > min_sim
+    graph = csr_matrix(
+        (combined_sim[linked], (rows[linked], targets[linked])),
+        shape=(len(df), len(df)),
     )
+    _, labels = connected_components(graph, directed=False)
 
-    df["cluster_id"] = clustering_model.fit_predict(sim_matrix)
+    df["cluster_id"] = labels
+    np.save(labels_path, labels)
     print(f"Identified {len(set(df['cluster_id']))} clusters.")
 
-    # Cleanup final matrix
-    del sim_matrix
-    gc.collect()
+    # Cleanup neighbour arrays
+    del combined_sim, graph
 
     return df
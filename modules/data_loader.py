@@ -11,6 +11,38 @@ TOPIC_FILE_MAP = {
     "Foreign Policy": "foreign.csv",
 }
 
+# Only the columns the pipeline uses are parsed
+COLUMNS = ["title", "url", "publish_date", "media_name"]
+TEXT_COLUMNS = ["title", "url", "media_name"]
+
+
+def read_csv(path, encoding):
+    """Reads the pipeline columns with the multithreaded Arrow CSV parser."""
+    return pd.read_csv(
+        path,
+        engine="pyarrow",
+        encoding=encoding,
+        on_bad_lines="skip",
+        usecols=COLUMNS,
+        parse_dates=["publish_date"],
+    )
+
+
+def load_csv(data_path, filename):
+    """Parses a topic CSV, falling back to latin-1 for non-UTF-8 files."""
+    # Try UTF-8 first. Arrow keeps undecodable values as raw bytes
+    # instead of raising, so check the text columns explicitly.
+    df = read_csv(data_path, encoding="utf-8")
+    if any(
+        pd.api.types.infer_dtype(df[col], skipna=True) in ("bytes", "mixed")
+        for col in TEXT_COLUMNS
+    ):
+        print(
+            f"Warning: UTF-8 decoding failed for {filename}. Retrying with 'latin-1'..."
+        )
+        df = read_csv(data_path, encoding="latin-1")
+    return df
+
 
 def get_data(topic_name):
     """
@@ -22,13 +54,7 @@ def get_data(topic_name):
         return pd.DataFrame()
 
     filename = TOPIC_FILE_MAP[topic_name]
-    # Construct absolute path to data directory
-    # Assuming data/ is at the project root, same level as main.py
-    # We can use a relative path or construct it relative to this file
-    # But since main.py is entry point, 'data/' works if cwd is project root.
-    # To be safer, let's look for it relative to config.py or use a known path.
-    # The user provided path: /Users/karti/Desktop/Ashoka/Monsoon25/Capstone Project/data
-
+    # data/ sits at the project root, next to main.py
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     data_path = os.path.join(base_dir, "data", filename)
 
@@ -38,24 +64,42 @@ def get_data(topic_name):
         print(f"Error: File not found at {data_path}")
         return pd.DataFrame()
 
+    # Parsed copy of the CSV, reused while it is newer than the CSV
+    parquet_path = os.path.splitext(data_path)[0] + ".parquet"
+
     try:
-        # Try UTF-8 first
-        try:
-            df = pd.read_csv(data_path, encoding="utf-8", on_bad_lines="skip")
-        except UnicodeDecodeError:
-            print(
-                f"Warning: UTF-8 decoding failed for {filename}. Retrying with 'latin-1'..."
-            )
-            df = pd.read_csv(data_path, encoding="latin-1", on_bad_lines="skip")
+        df = None
+        if os.path.exists(parquet_path) and os.path.getmtime(
+            parquet_path
+        ) >= os.path.getmtime(data_path):
+            print(f"Using cached {parquet_path}")
+            try:
+                df = pd.read_parquet(parquet_path, columns=COLUMNS)
+            except Exception as e:
+                # Truncated or corrupt cache: re-parse the CSV and rewrite it
+                print(f"Warning: Could not read {parquet_path}: {e}")
 
-        # Ensure 'publish_date' is standard format
+        if df is None:
+            df = load_csv(data_path, filename)
+            # The cache is only an optimisation; never lose the parsed CSV
+            # over it (disk errors, Arrow type errors on mixed columns, ...)
+            try:
+                df.to_parquet(parquet_path, compression="zstd", index=False)
+            except Exception as e:
+                print(f"Warning: Could not cache {parquet_path}: {e}")
+
+        # Ensure 'publish_date' is standard format (no-op if Arrow parsed it)
         df["publish_date"] = pd.to_datetime(df["publish_date"], errors="coerce")
 
+        # Few distinct outlets across many rows: store as codes for the groupbys
+        df["media_name"] = df["media_name"].astype("category")
+
         # Filter by date range from config
         original_count = len(df)
         df = df[
-            (df["publish_date"] >= pd.Timestamp(config.START_DATE))
-            & (df["publish_date"] <= pd.Timestamp(config.END_DATE))
+            df["publish_date"].between(
+                pd.Timestamp(config.START_DATE), pd.Timestamp(config.END_DATE)
+            )
         ]
         filtered_count = len(df)
 
@@ -1,23 +1,89 @@
+import matplotlib
+
+# Non-interactive backend: figures are only ever written to PNG
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
+import numpy as np
 import networkx as nx
+from scipy.optimize import minimize
+from scipy.spatial.distance import pdist, squareform
 import os
+import hashlib
+import pickle
 import community.community_louvain as community_louvain
 import matplotlib.dates as mdates
 import config
 from modules import analysis
 
+__all__ = [
+    "save_plot",
+    "plot_coverage_over_time",
+    "plot_sentiment_distribution",
+    "plot_event_framing",
+    "plot_source_network",
+    "plot_top_keywords",
+    "render_all",
+]
+
 # Set Style
 sns.set_theme(style="whitegrid")
 plt.rcParams["figure.figsize"] = (12, 6)
 
+# Node count from which the network layout uses Barnes-Hut repulsion
+BARNES_HUT_MIN_NODES = 500
+
+# Plotting window, parsed once at import
+_START = pd.Timestamp(config.START_DATE)
+_END = pd.Timestamp(config.END_DATE)
+
+
+# Figures redrawn for every plot of a kind (Global to avoid re-creating them),
+# keyed by name and created on first use
+_reused_figures = {}
+
+
+def get_reused_axes(name, figsize):
+    """Returns a cleared (fig, ax) pair that is kept open between plots."""
+    if name not in _reused_figures:
+        _reused_figures[name] = plt.subplots(figsize=figsize)
+    fig, ax = _reused_figures[name]
+    ax.clear()
+    return fig, ax
+
+
+# Sentiment keywords per (topic, content hash, top_n), most recent last
+_keyword_cache = {}
+KEYWORD_CACHE_SIZE = 64
+
+
+def get_sentiment_keywords(df, topic_name, top_n=10):
+    """
+    Returns analysis.extract_sentiment_keywords(df, top_n), memoized on a hash of
+    the titles and sentiment labels so re-renders of the same topic skip TF-IDF.
+    """
+    digest = hashlib.blake2b(
+        pd.util.hash_pandas_object(
+            df[["title", "sentiment_label"]], index=False
+        ).to_numpy()
+    ).hexdigest()
+    key = (topic_name, digest, top_n)
+
+    if key not in _keyword_cache:
+        if len(_keyword_cache) >= KEYWORD_CACHE_SIZE:
+            _keyword_cache.pop(next(iter(_keyword_cache)))
+        _keyword_cache[key] = analysis.extract_sentiment_keywords(df, top_n=top_n)
+    return _keyword_cache[key]
 
-def save_plot(fig, folder, filename):
+
+def save_plot(fig, folder, filename, dpi=150, close=True):
     """Helper to save plots to the correct directory."""
     path = os.path.join(config.DIRS[folder], filename)
-    fig.savefig(path, bbox_inches="tight", dpi=300)
-    plt.close(fig)
+    # Fast zlib level: most of the PNG write time goes to compression
+    fig.savefig(path, bbox_inches="tight", dpi=dpi, pil_kwargs={"compress_level": 1})
+    if close:
+        plt.close(fig)
     print(f"Saved plot: {path}")
 
 
@@ -26,31 +92,32 @@ def plot_coverage_over_time(df, topic_name):
     if df.empty or "cluster_id" not in df.columns:
         return
 
-    df["publish_date"] = pd.to_datetime(df["publish_date"])
-    top_clusters = df["cluster_id"].value_counts().head(5).index
+    # Parse only if needed, on a copy so the caller's frame is not mutated
+    if not pd.api.types.is_datetime64_any_dtype(df["publish_date"]):
+        df = df.assign(publish_date=pd.to_datetime(df["publish_date"]))
+    top_clusters = df["cluster_id"].value_counts(sort=False).nlargest(5).index
     df_top = df[df["cluster_id"].isin(top_clusters)]
 
     # Create descriptive labels
-    cluster_labels = {}
-    for cid in top_clusters:
-        cluster_df = df[df["cluster_id"] == cid]
-        # Use the most frequent title as the representative label
-        title_counts = cluster_df["title"].value_counts()
-        if not title_counts.empty:
-            best_title = title_counts.index[0]
-            # Truncate to 50 chars
-            if len(best_title) > 60:
-                best_title = best_title[:57] + "..."
-        else:
-            best_title = "Unknown Event"
-
-        cluster_labels[cid] = f"{best_title} (ID:{cid})"
-
-    monthly_counts = (
-        df_top.groupby([pd.Grouper(key="publish_date", freq="ME"), "cluster_id"])
-        .size()
-        .unstack(fill_value=0)
+    # Use the most frequent title of each cluster as the representative label,
+    # all five found in one groupby over df_top
+    top_titles = df_top.groupby("cluster_id")["title"].agg(
+        lambda s: s.value_counts().index[0] if s.notna().any() else "Unknown Event"
+    )
+    # Truncate to 60 chars
+    cluster_labels = {
+        cid: f"{(t[:57] + '...') if len(t) > 60 else t} (ID:{cid})"
+        for cid, t in top_titles.items()
+    }
+
+    # Bucket by calendar month on datetime64[M] keys (hashed int64 factorization,
+    # no per-row Timestamp -> Period conversion), labelled by month end
+    months = df_top["publish_date"].to_numpy(dtype="datetime64[M]")
+    monthly_counts = pd.crosstab(
+        months, df_top["cluster_id"].to_numpy(), colnames=["cluster_id"]
     )
+    month_ends = pd.DatetimeIndex(monthly_counts.index) + pd.offsets.MonthEnd(0)
+    monthly_counts.index = month_ends
 
     # Rename columns
     monthly_counts.rename(columns=cluster_labels, inplace=True)
@@ -60,7 +127,8 @@ def plot_coverage_over_time(df, topic_name):
     # Use explicit stackplot for better control over x-axis dates
     # monthly_counts.index should be DatetimeIndex
     dates = monthly_counts.index
-    values = monthly_counts.T.values
+    # Counts fit in int32; half the bytes of the default int64
+    values = monthly_counts.T.to_numpy(dtype=np.int32)
     labels = monthly_counts.columns
 
     ax.stackplot(dates, values, labels=labels, alpha=0.7, cmap="tab10")
@@ -70,9 +138,7 @@ def plot_coverage_over_time(df, topic_name):
     ax.set_ylabel("Number of Stories")
 
     # Format x-axis
-    start_date = pd.to_datetime(config.START_DATE)
-    end_date = pd.to_datetime(config.END_DATE)
-    ax.set_xlim(start_date, end_date)
+    ax.set_xlim(_START, _END)
 
     ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %Y"))
     ax.xaxis.set_major_locator(mdates.MonthLocator(interval=6))
@@ -95,15 +161,12 @@ def plot_sentiment_distribution(df, topic_name):
     # Explicit colors: Negative=Red, Neutral=Grey, Positive=Green
     palette = {"Negative": "#ff9999", "Neutral": "#d3d3d3", "Positive": "#99ff99"}
 
-    sns.countplot(
-        x="sentiment_label",
-        data=df,
-        order=["Negative", "Neutral", "Positive"],
-        hue="sentiment_label",
-        palette=palette,
-        legend=False,
-        ax=ax,
-    )
+    order = analysis.SENTIMENT_LABELS
+    counts = df["sentiment_label"].value_counts().reindex(order, fill_value=0)
+    ax.bar(order, counts.to_numpy(dtype=np.int32), color=[palette[k] for k in order])
+    # Categorical axis: no grid lines through the bars
+    ax.grid(False, axis="x")
+    ax.set_xlim(-0.5, len(order) - 0.5)
     ax.set_title(f"{topic_name}: Overall Sentiment Distribution", fontsize=14)
     ax.set_xlabel("Sentiment")
     ax.set_ylabel("Count")
@@ -113,13 +176,14 @@ def plot_sentiment_distribution(df, topic_name):
     # 2. Subjectivity Histogram
     if "subjectivity_score" in df.columns:
         fig2, ax2 = plt.subplots(figsize=(8, 5))
-        sns.histplot(
-            df["subjectivity_score"], bins=20, kde=True, color="purple", ax=ax2
-        )
+        # Unrounded float64: most scores sit exactly on the 0.05 bin edges
+        vals = df["subjectivity_score"].dropna().to_numpy()
+        ax2.hist(vals, bins=20, color="purple", alpha=0.5, edgecolor="white")
         ax2.set_title(
             f"{topic_name}: Subjectivity Distribution (0=Fact, 1=Opinion)", fontsize=14
         )
         ax2.set_xlabel("Subjectivity Score")
+        ax2.set_ylabel("Count")
 
         save_plot(fig2, "sentiment", f"{topic_name}_subjectivity.png")
 
@@ -129,57 +193,26 @@ def plot_event_framing(df, topic_name):
     if df.empty or "cluster_id" not in df.columns:
         return
 
-    top_clusters = df["cluster_id"].value_counts().head(3).index.tolist()
+    top_clusters = df["cluster_id"].value_counts(sort=False).nlargest(3).index.tolist()
 
     for cluster_id in top_clusters:
         cluster_df = df[df["cluster_id"] == cluster_id]
         if len(cluster_df) < 5:
             continue
 
-        top_sources = cluster_df["media_name"].value_counts().head(5).index.tolist()
-        source_df = cluster_df[cluster_df["media_name"].isin(top_sources)].copy()
+        # Only outlets present in this cluster: a categorical media_name also
+        # counts every other outlet, with 0
+        source_counts = cluster_df["media_name"].value_counts(sort=False)
+        source_counts = source_counts[source_counts > 0].nlargest(5)
+        top_sources = source_counts.index.tolist()
+        source_df = cluster_df[cluster_df["media_name"].isin(top_sources)]
 
         if source_df.empty:
             continue
 
-        # Calculate Net Sentiment (Pos - Neg) for sorting
-        source_stats = []
-        for source in top_sources:
-            s_df = source_df[source_df["media_name"] == source]
-            n = len(s_df)
-            if n == 0:
-                continue
-
-            pos_pct = (s_df["sentiment_label"] == "Positive").mean() * 100
-            neg_pct = (s_df["sentiment_label"] == "Negative").mean() * 100
-            net_sentiment = pos_pct - neg_pct
-            source_stats.append(
-                {"source": source, "net_sentiment": net_sentiment, "n": n}
-            )
-
-        # Sort by Net Sentiment
-        source_stats.sort(key=lambda x: x["net_sentiment"])
-        sorted_sources = [x["source"] for x in source_stats]
-
-        # Rename sources with n=X
-        source_labels = {
-            x["source"]: f"{x['source']} (n={x['n']})" for x in source_stats
-        }
-        source_df["display_name"] = source_df["media_name"].map(source_labels)
-
-        sentiment_counts = (
-            source_df.groupby(["display_name", "sentiment_label"])
-            .size()
-            .unstack(fill_value=0)
-        )
-
-        # Reorder based on sorted sources
-        sorted_labels = [source_labels[s] for s in sorted_sources if s in source_labels]
-        sentiment_counts = sentiment_counts.reindex(sorted_labels)
-
-        sentiment_pcts = (
-            sentiment_counts.div(sentiment_counts.sum(axis=1), axis=0) * 100
-        )
+        # Sentiment shares per source in one groupby
+        grp = source_df.groupby("media_name", observed=True)["sentiment_label"]
+        sentiment_pcts = grp.value_counts(normalize=True).unstack(fill_value=0) * 100
 
         # Ensure columns exist
         for col in ["Negative", "Neutral", "Positive"]:
@@ -187,18 +220,149 @@ def plot_event_framing(df, topic_name):
                 sentiment_pcts[col] = 0
         sentiment_pcts = sentiment_pcts[["Negative", "Neutral", "Positive"]]
 
-        fig, ax = plt.subplots(figsize=(10, 5))
-        sentiment_pcts.plot(
+        # Sort by Net Sentiment (Pos - Neg); ties keep the top_sources order
+        sentiment_pcts = sentiment_pcts.reindex(top_sources).dropna()
+        net_sentiment = sentiment_pcts["Positive"] - sentiment_pcts["Negative"]
+        sentiment_pcts = sentiment_pcts.loc[
+            net_sentiment.sort_values(kind="stable").index
+        ]
+
+        # Rename sources with n=X
+        sentiment_pcts.index = [
+            f"{s} (n={source_counts[s]})" for s in sentiment_pcts.index
+        ]
+
+        fig, ax = get_reused_axes("framing", figsize=(10, 5))
+        # Shares are sorted in float64 above; float32 is plenty for drawing
+        sentiment_pcts.astype(np.float32).plot(
             kind="bar", stacked=True, color=["#ff9999", "#d3d3d3", "#99ff99"], ax=ax
         )
 
         sample_title = cluster_df["title"].iloc[0][:50] + "..."
         ax.set_title(f'Framing of Event {cluster_id}: "{sample_title}"', fontsize=12)
         ax.set_ylabel("Percentage")
+        ax.set_ylim(0, 100)
         ax.set_xlabel("Source")
         ax.legend(bbox_to_anchor=(1.05, 1), loc="upper left")
 
-        save_plot(fig, "framing", f"{topic_name}_framing_{cluster_id}.png")
+        save_plot(fig, "framing", f"{topic_name}_framing_{cluster_id}.png", close=False)
+
+
+def _energy_layout(G, k=0.5, gravity=1.0, seed=42, maxiter=200):
+    """
+    Force-directed layout solved as one energy minimisation with L-BFGS.
+    Uses Fruchterman-Reingold energies: weighted springs pull linked nodes
+    together (w * d^3 / 3k), every pair repels (-k^2 * ln d), and a gravity
+    term keeps disconnected nodes on the canvas.
+    Returns {node: array([x, y])} scaled to [-1, 1], like nx.spring_layout.
+    """
+    nodes = list(G.nodes())
+    n = len(nodes)
+    if n < 2:
+        return {node: np.zeros(2) for node in nodes}
+
+    # Condensed (i < j) edge weights, matching pdist's pair order
+    W = nx.to_numpy_array(G, nodelist=nodes, weight="weight")
+    w = squareform(W, checks=False)
+
+    def energy_and_grad(x):
+        P = x.reshape(n, 2)
+        d = np.maximum(pdist(P), 1e-9)
+
+        energy = (w * d**3).sum() / (3 * k) - k**2 * np.log(d).sum()
+        energy += 0.5 * gravity * (P**2).sum()
+
+        # dE/dp_i = sum_j c_ij * (p_i - p_j), with c_ij = (dE/dd) / d
+        C = squareform(w * d / k - k**2 / d**2)
+        grad = C.sum(axis=1)[:, None] * P - C @ P + gravity * P
+        return energy, grad.ravel()
+
+    x0 = np.random.default_rng(seed).random(n * 2)
+    result = minimize(
+        energy_and_grad,
+        x0,
+        jac=True,
+        method="L-BFGS-B",
+        options={"maxiter": maxiter},
+    )
+
+    pos = nx.rescale_layout(result.x.reshape(n, 2))
+    return dict(zip(nodes, pos))
+
+
+def _barnes_hut_layout(G, seed=42, iterations=200):
+    """
+    ForceAtlas2 layout with Barnes-Hut O(n log n) repulsion, for graphs too
+    large for the all-pairs energy layout. Requires `pip install fa2_modified`;
+    returns None when it is not installed.
+    """
+    try:
+        from fa2_modified import ForceAtlas2
+    except ImportError:
+        print("fa2_modified not installed. Using the all-pairs layout instead.")
+        return None
+
+    # Explicit start positions keep the layout deterministic
+    nodes = list(G.nodes())
+    start = np.random.default_rng(seed).random((len(nodes), 2))
+    forceatlas2 = ForceAtlas2(
+        scalingRatio=2.0, barnesHutOptimize=True, barnesHutTheta=1.2, verbose=False
+    )
+    pos = forceatlas2.forceatlas2_networkx_layout(
+        G,
+        pos={node: tuple(xy) for node, xy in zip(nodes, start)},
+        iterations=iterations,
+        weight_attr="weight",
+    )
+
+    scaled = nx.rescale_layout(np.array([pos[node] for node in nodes]))
+    return dict(zip(nodes, scaled))
+
+
+def _cached_layout(G):
+    """
+    Returns layout positions for G, cached on disk in config.CACHE_DIR.
+    Small graphs use _energy_layout; from BARNES_HUT_MIN_NODES nodes on, the
+    O(n^2) pairwise repulsion is swapped for _barnes_hut_layout.
+    The layout is deterministic (fixed seed), so the key is the node order
+    plus the weighted edge list.
+    """
+    edges = list(G.edges(data="weight", default=1))
+    key = hashlib.blake2b(
+        repr(("energy/fa2", list(G.nodes()), edges)).encode()
+    ).hexdigest()
+    cache_path = os.path.join(config.CACHE_DIR, f".layout_{key}.pkl")
+
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+
+    pos = None
+    if G.number_of_nodes() >= BARNES_HUT_MIN_NODES:
+        pos = _barnes_hut_layout(G)
+    if pos is None:
+        pos = _energy_layout(G)
+
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    with open(cache_path, "wb") as f:
+        pickle.dump(pos, f)
+    return pos
+
+
+def _prune_weak_edges(G):
+    """
+    Returns a copy of G with every node but only edges at or above the median
+    edge weight, for community detection and layout.
+    """
+    edges = list(G.edges(data="weight", default=1))
+    if not edges:
+        return G
+
+    threshold = np.median([w for _, _, w in edges])
+    pruned = nx.Graph()
+    pruned.add_nodes_from(G.nodes())
+    pruned.add_weighted_edges_from((u, v, w) for u, v, w in edges if w >= threshold)
+    return pruned
 
 
 def plot_source_network(G, topic_name):
@@ -206,24 +370,31 @@ def plot_source_network(G, topic_name):
     if G is None:
         return
 
+    # Louvain and the layout run on the strongest half of the edges; the
+    # weak ones are mostly noise and still get drawn below
+    G_strong = _prune_weak_edges(G)
+
     # Community detection
     try:
-        partition = community_louvain.best_partition(G)
+        partition = community_louvain.best_partition(G_strong)
     except Exception as e:
         print(f"Community detection failed: {e}")
         partition = {n: 0 for n in G.nodes()}
 
     fig, ax = plt.subplots(figsize=(12, 12))
-    pos = nx.spring_layout(G, k=0.5, seed=42)
+    pos = _cached_layout(G_strong)
 
     # Node sizing based on degree
-    degrees = dict(G.degree())
+    n_nodes = G.number_of_nodes()
+    degrees = np.fromiter((d for _, d in G.degree()), dtype=np.int32, count=n_nodes)
     # scikit-network-style sizing (scaled)
     # INCREASED SIZE: Base 1000, Multiplier 300
-    node_sizes = [degrees[n] * 300 + 1000 for n in G.nodes()]
+    node_sizes = degrees * 300 + 1000
 
     # Node coloring
-    node_colors = [partition.get(n) for n in G.nodes()]
+    node_colors = np.fromiter(
+        (partition.get(n, 0) for n in G.nodes()), dtype=np.int32, count=n_nodes
+    )
 
     nx.draw_networkx_nodes(
         G,
@@ -237,7 +408,12 @@ def plot_source_network(G, topic_name):
 
     # Edge styling
     # INCREASED THICKNESS: Multiplier 5 (was 2)
-    weights = [G[u][v].get("weight", 0) * 5 for u, v in G.edges()]
+    weights = np.fromiter(
+        (w for _, _, w in G.edges(data="weight", default=0)),
+        dtype=np.float32,
+        count=G.number_of_edges(),
+    )
+    weights *= 5
 
     nx.draw_networkx_edges(G, pos, alpha=0.5, edge_color="black", width=weights, ax=ax)
 
@@ -251,7 +427,8 @@ def plot_source_network(G, topic_name):
     # Create legend for communities (optional but good)
     # We can skip explicit legend for now as requested just "color the nodes"
 
-    save_plot(fig, "networks", f"{topic_name}_network.png")
+    # Dense node labels need the higher resolution
+    save_plot(fig, "networks", f"{topic_name}_network.png", dpi=300)
 
 
 def plot_top_keywords(df, topic_name):
@@ -259,41 +436,40 @@ def plot_top_keywords(df, topic_name):
     if df.empty or "sentiment_label" not in df.columns:
         return
 
-    # Split by sentiment
-    pos_df = df[df["sentiment_label"] == "Positive"]
-    neg_df = df[df["sentiment_label"] == "Negative"]
-
-    pos_kw = analysis.extract_keywords(pos_df, top_n=10)
-    neg_kw = analysis.extract_keywords(neg_df, top_n=10)
+    keywords = get_sentiment_keywords(df, topic_name, top_n=10)
+    pos_kw, neg_kw = keywords["Positive"], keywords["Negative"]
 
     if not pos_kw and not neg_kw:
         return
 
-    # Prepare data for plotting
-    data = []
-    for k, v in pos_kw.items():
-        data.append({"Keyword": k, "Score": v, "Sentiment": "Positive"})
-    for k, v in neg_kw.items():
-        data.append({"Keyword": k, "Score": v, "Sentiment": "Negative"})
-
-    df_kw = pd.DataFrame(data)
+    # One row per keyword (positive ones first), one bar per sentiment
+    keywords = list(dict.fromkeys([*pos_kw, *neg_kw]))
+    y_pos = np.arange(len(keywords))
+    pos_scores = np.array([pos_kw.get(k, 0) for k in keywords], dtype=np.float32)
+    neg_scores = np.array([neg_kw.get(k, 0) for k in keywords], dtype=np.float32)
 
-    if df_kw.empty:
-        return
+    fig, ax = get_reused_axes("keywords", figsize=(12, 8))
 
-    fig, ax = plt.subplots(figsize=(12, 8))
-
-    # Plot with hue for comparison
-    sns.barplot(
-        x="Score",
-        y="Keyword",
-        hue="Sentiment",
-        data=df_kw,
-        palette={"Positive": "#99ff99", "Negative": "#ff9999"},
-        ax=ax,
-    )
+    # Paired bars for comparison
+    ax.barh(y_pos - 0.2, pos_scores, height=0.4, color="#99ff99", label="Positive")
+    ax.barh(y_pos + 0.2, neg_scores, height=0.4, color="#ff9999", label="Negative")
+    ax.set_yticks(y_pos, keywords)
+    # First keyword at the top, no grid lines between the paired bars
+    ax.set_ylim(len(keywords) - 0.5, -0.5)
+    ax.grid(False, axis="y")
+    ax.legend(title="Sentiment")
 
     ax.set_title(f"{topic_name}: Top Keywords by Sentiment", fontsize=14)
     ax.set_xlabel("TF-IDF Score")
+    ax.set_ylabel("Keyword")
+
+    save_plot(fig, "keywords", f"{topic_name}_keywords_comparison.png", close=False)
+
 
-    save_plot(fig, "keywords", f"{topic_name}_keywords_comparison.png")
+def render_all(df, topic_name, G):
+    """Generates every plot for one topic."""
+    plot_coverage_over_time(df, topic_name)
+    plot_sentiment_distribution(df, topic_name)
+    plot_event_framing(df, topic_name)
+    plot_source_network(G, topic_name)
+    plot_top_keywords(df, topic_name)
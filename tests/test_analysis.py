@@ -0,0 +1,48 @@
+import builtins
+import contextlib
+import io
+import os
+import unittest
+
+os.environ.setdefault("MC_API_KEY", "test")
+
+import config
+from modules import analysis
+
+
+class OnnxModelLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.model_path = config.SENTIMENT_ONNX_MODEL
+        config.SENTIMENT_ONNX_MODEL = "sentiment.onnx"
+        analysis._onnx_model = None
+
+    def tearDown(self):
+        config.SENTIMENT_ONNX_MODEL = self.model_path
+        analysis._onnx_model = None
+
+    def test_failed_load_is_cached(self):
+        attempts = []
+        real_import = builtins.__import__
+
+        def fake_import(name, *args, **kwargs):
+            if name == "onnxruntime":
+                attempts.append(name)
+                raise ImportError("No module named 'onnxruntime'")
+            return real_import(name, *args, **kwargs)
+
+        output = io.StringIO()
+        builtins.__import__ = fake_import
+        try:
+            with contextlib.redirect_stdout(output):
+                for _ in range(3):
+                    self.assertFalse(analysis.has_onnx_model())
+        finally:
+            builtins.__import__ = real_import
+
+        self.assertIs(analysis._onnx_model, False)
+        self.assertEqual(attempts, ["onnxruntime"])
+        self.assertEqual(output.getvalue().count("unavailable"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
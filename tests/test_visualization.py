@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("MC_API_KEY", "test")
+
+import numpy as np
+import pandas as pd
+import config
+from modules import visualization
+
+
+class PlotEventFramingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dirs = config.DIRS
+        config.DIRS = {**config.DIRS, "framing": self.tmp.name}
+
+    def tearDown(self):
+        config.DIRS = self.dirs
+        self.tmp.cleanup()
+
+    def test_cluster_with_fewer_than_five_outlets(self):
+        # media_name is categorical (as from data_loader), so c.com is a known
+        # outlet with no stories in cluster 0
+        df = pd.DataFrame(
+            {
+                "cluster_id": [0] * 6 + [1],
+                "media_name": pd.Categorical(
+                    ["a.com", "b.com", "a.com", "b.com", "a.com", "a.com", "c.com"]
+                ),
+                "sentiment_label": pd.Categorical(
+                    ["Positive", "Negative", "Neutral"] * 2 + ["Neutral"],
+                    categories=["Negative", "Neutral", "Positive"],
+                ),
+                "title": ["Budget story"] * 7,
+            }
+        )
+
+        visualization.plot_event_framing(df, "T")
+
+        self.assertEqual(os.listdir(self.tmp.name), ["T_framing_0.png"])
+        _, ax = visualization._reused_figures["framing"]
+        labels = [t.get_text() for t in ax.get_xticklabels()]
+        self.assertEqual(labels, ["a.com (n=4)", "b.com (n=2)"])
+
+
+class PlotSentimentDistributionTest(unittest.TestCase):
+    def test_subjectivity_bins_match_float64_scores(self):
+        # Scores on (and just off) the 0.05 bin edges, like TextBlob's
+        scores = np.array(
+            [i / 20 for i in range(21)] + [0.1 + 0.2, 0.7 * 0.5, 1 / 3, 0.45] * 3
+        )
+        expected, _ = np.histogram(scores, bins=20)
+        # float32 rounding moves some of these across an edge
+        self.assertFalse(
+            np.array_equal(expected, np.histogram(scores.astype(np.float32), 20)[0])
+        )
+
+        df = pd.DataFrame(
+            {
+                "sentiment_label": pd.Categorical(
+                    ["Neutral"] * len(scores),
+                    categories=["Negative", "Neutral", "Positive"],
+                ),
+                "subjectivity_score": scores,
+            }
+        )
+
+        saved = {}
+        original_save_plot = visualization.save_plot
+        visualization.save_plot = lambda fig, folder, filename, **kwargs: saved.update(
+            {filename: fig}
+        )
+        try:
+            visualization.plot_sentiment_distribution(df, "T")
+        finally:
+            visualization.save_plot = original_save_plot
+
+        ax = saved["T_subjectivity.png"].axes[0]
+        counts = [int(p.get_height()) for p in ax.patches]
+        self.assertEqual(counts, expected.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()